@@ -9,12 +9,16 @@ import pandas as pd
 import logging
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 from typing import Dict, List, Optional, Union, Any, Literal
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 
+from src.utils.http_retry import build_api_retry
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -51,6 +55,7 @@ class Config:
     # Processamento
     BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+    API_WORKERS = int(os.getenv("API_WORKERS", "16"))
     USE_CSV = os.getenv("USE_CSV", "false").lower() == "true"
 
 # =================================================================
@@ -187,7 +192,10 @@ class DatabaseManager:
         
         try:
             with self.engine.begin() as conn:
-                df.to_sql(table_name, conn, if_exists=if_exists, index=False, method='multi')
+                df.to_sql(
+                    table_name, conn, if_exists=if_exists, index=False,
+                    method='multi', chunksize=multi_insert_chunksize(df)
+                )
             
             logger.info(f"{len(df)} registros salvos em {table_name}")
             return True
@@ -219,6 +227,17 @@ class CapesAPI:
     def __init__(self):
         self.config = Config()
         self.base_url = self.config.CAPES_API_URL
+        
+        # Retry delegado ao urllib3 (build_api_retry); o pool acompanha
+        # o número de workers para reaproveitar os sockets
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.API_WORKERS,
+            pool_maxsize=self.config.API_WORKERS,
+            max_retries=build_api_retry(self.config.MAX_RETRIES),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     @log_execution
     def fetch_data(self, resource_id: str, limit: int = 1000, offset: int = 0) -> Dict:
@@ -229,45 +248,49 @@ class CapesAPI:
             'offset': offset
         }
         
-        for attempt in range(self.config.MAX_RETRIES):
-            try:
-                response = requests.get(self.base_url, params=params, timeout=30)
-                response.raise_for_status()
-                return response.json()
-                
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Tentativa {attempt + 1} falhou: {e}")
-                if attempt == self.config.MAX_RETRIES - 1:
-                    raise
-                time.sleep(2 ** attempt)  # Backoff exponencial
-        return {}
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=30)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            # Só os status de API_RETRY_STATUS (src/utils/http_retry.py) e falhas de
+            # conexão são repetidos; a mensagem do urllib3 ("Max retries exceeded ...")
+            # já indica quando houve retry
+            logger.warning(f"Requisição à API CAPES falhou: {e}")
+            raise
     
     @log_execution
     def fetch_all_data(self, resource_id: str) -> pd.DataFrame:
         """Busca todos os dados de um resource"""
-        all_records = []
-        offset = 0
         batch_size = self.config.BATCH_SIZE
+        limite = 500000  # Limite de segurança
         
         logger.info(f"Iniciando busca completa para resource: {resource_id}")
         
-        while True:
-            data = self.fetch_data(resource_id, limit=batch_size, offset=offset)
-            records = data.get('result', {}).get('records', [])
-            
-            if not records:
-                break
-            
-            all_records.extend(records)
-            offset += batch_size
+        # A primeira página informa o total; as demais são buscadas em paralelo
+        first = self.fetch_data(resource_id, limit=batch_size, offset=0).get('result', {})
+        records = first.get('records', [])
+        total = first.get('total', len(records))
+        if total > limite:
+            logger.warning("Limite de 500k registros atingido")
+            total = limite
+        
+        offsets = range(batch_size, total, batch_size)
+        pages = [records]
+        coletados = len(records)
+        if records and len(offsets):
+            def fetch_page(offset):
+                data = self.fetch_data(resource_id, limit=batch_size, offset=offset)
+                return data.get('result', {}).get('records', [])
             
-            logger.info(f"Coletados {len(all_records)} registros...")
-
-            # Limite de segurança
-            if len(all_records) > 500000:
-                logger.warning("Limite de 500k registros atingido")
-                break
+            with ThreadPoolExecutor(max_workers=self.config.API_WORKERS) as executor:
+                # map preserva a ordem dos offsets
+                for page in executor.map(fetch_page, offsets):
+                    pages.append(page)
+                    coletados += len(page)
+                    logger.info(f"Coletados {coletados} registros...")
         
+        all_records = [record for page in pages for record in page]
         logger.info(f"Total coletado: {len(all_records)} registros")
         return pd.DataFrame(all_records)
 
@@ -275,6 +298,14 @@ class CapesAPI:
 # UTILIDADES GERAIS
 # =================================================================
 
+# O PostgreSQL aceita no máximo 65535 parâmetros por comando; com
+# method='multi' cada lote usa linhas × colunas parâmetros
+PG_MAX_BIND_PARAMS = 65535
+
+def multi_insert_chunksize(df: pd.DataFrame, max_rows: int = 10000) -> int:
+    """Maior chunksize do to_sql(method='multi') que cabe no limite de parâmetros"""
+    return max(1, min(max_rows, PG_MAX_BIND_PARAMS // max(1, len(df.columns))))
+
 @log_execution
 def clean_text(text: Union[str, None]) -> str:
     """Limpa e padroniza texto"""
@@ -348,12 +348,12 @@ if __name__ == "__main__":
     if len(df_lista) > 0:
         print("\nLista completa dos ODS:")
         print("\nODS Oficiais da ONU (1-17):")
-        for _, row in df_lista[df_lista['ods_numero'] <= 17].iterrows():
-            print(f"  {row['ods_codigo']}: {row['ods_nome']} [{row['ods_categoria']}]")
+        for row in df_lista[df_lista['ods_numero'] <= 17].itertuples(index=False):
+            print(f"  {row.ods_codigo}: {row.ods_nome} [{row.ods_categoria}]")
         
         print("\nODS Expandidos (18-20):")
-        for _, row in df_lista[df_lista['ods_numero'] > 17].iterrows():
-            print(f"  {row['ods_codigo']}: {row['ods_nome']} [{row['ods_categoria']}]")
+        for row in df_lista[df_lista['ods_numero'] > 17].itertuples(index=False):
+            print(f"  {row.ods_codigo}: {row.ods_nome} [{row.ods_categoria}]")
     print("\nProcesso concluído. Dimensão ODS criada com sucesso.")
     print("A dimensão inclui 20 ODS organizados por categorias e tipos.")
     print("ODS 18-20 são expansões para contemplar Ciência/Tecnologia, Cultura e Governança Global.")
@@ -20,7 +20,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
 sys.path.insert(0, project_root)
 
-from src.core.core import get_db_manager
+from src.core.core import get_db_manager, multi_insert_chunksize
 
 def get_project_root() -> Path:
     """Encontra o diretório raiz do projeto de forma robusta."""
@@ -273,7 +273,10 @@ def criar_dimensao_ppg():
         
         # 6. Inserir dados processados no banco
         logger.info("💾 Inserindo dados processados no banco...")
-        df_final.to_sql('dim_ppg', db.engine, if_exists='append', index=False, method='multi')
+        df_final.to_sql(
+            'dim_ppg', db.engine, if_exists='append', index=False,
+            method='multi', chunksize=multi_insert_chunksize(df_final)
+        )
         
         # 7. Verificar inserção
         count_query = "SELECT COUNT(*) as total FROM dim_ppg;"
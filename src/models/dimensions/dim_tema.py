@@ -14,6 +14,7 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 # Garantir raiz do projeto no PYTHONPATH para execuções diretas
@@ -55,6 +56,11 @@ UF_MAPPING = {
     "TOCANTINS": "TO",
 }
 
+# UF_MAPPING compilado uma vez: nome -> posição no índice -> sigla; posição
+# -1 (nome fora do mapa) cai no último elemento, "XX"
+UF_NOMES = pd.Index(list(UF_MAPPING))
+UF_SIGLAS = np.array(list(UF_MAPPING.values()) + ["XX"], dtype=object)
+
 
 class DimTemaETL(DimensionETL):
     """Implementação padronizada da dim_tema."""
@@ -86,14 +92,8 @@ class DimTemaETL(DimensionETL):
         df = data.rename(columns={"palavrachave_nome": "palavra_chave"}).copy()
 
         if "uf" in df.columns:
-            df["sigla_uf"] = (
-                df["uf"]
-                .fillna("")
-                .astype(str)
-                .str.upper()
-                .map(UF_MAPPING)
-                .fillna("XX")
-            )
+            codigos = UF_NOMES.get_indexer(df["uf"].fillna("").astype(str).str.upper())
+            df["sigla_uf"] = UF_SIGLAS[codigos]
         else:
             df["sigla_uf"] = "XX"
 
@@ -227,24 +227,28 @@ def mapear_temas_ods_automatico():
     
     # Criar mapeamentos baseados em palavras-chave
     mapeamentos = []
+    data_associacao = datetime.now().date()
     
-    for _, tema in df_temas.iterrows():
-        palavra_chave = str(tema['palavra_chave']).lower()
+    # Textos dos ODS normalizados uma única vez (não a cada tema)
+    ods_textos = [
+        (ods_sk, str(descritores).lower(), str(ods_nome).lower())
+        for ods_sk, descritores, ods_nome in df_ods[['ods_sk', 'descritores', 'ods_nome']].itertuples(index=False, name=None)
+    ]
+    
+    for tema_sk, palavra_chave in df_temas[['tema_sk', 'palavra_chave']].itertuples(index=False, name=None):
+        palavra_chave = str(palavra_chave).lower()
         
-        for _, ods in df_ods.iterrows():
-            descritores = str(ods['descritores']).lower()
-            nome_ods = str(ods['ods_nome']).lower()
-            
+        for ods_sk, descritores, nome_ods in ods_textos:
             # Verificar match
             if palavra_chave in descritores or palavra_chave in nome_ods:
                 nivel_confianca = 80.0 if palavra_chave in descritores else 60.0
                 
                 mapeamentos.append({
-                    'tema_sk': tema['tema_sk'],
-                    'ods_sk': ods['ods_sk'],
+                    'tema_sk': tema_sk,
+                    'ods_sk': ods_sk,
                     'tipo_associacao': 'Automática',
                     'nivel_confianca': nivel_confianca,
-                    'data_associacao': datetime.now().date(),
+                    'data_associacao': data_associacao,
                     'usuario_associacao': 'Sistema',
                     'observacao': f'Match automático: "{palavra_chave}" encontrada em descritores ODS',
                     'ativo': True
@@ -210,7 +210,8 @@ class FactTitulacaoETL(FactETL):
         if tempo_df.empty or "ano" not in tempo_df.columns:
             return pd.Series(0, index=df.index)
 
-        mapping = {int(row["ano"]): int(row["tempo_sk"]) for _, row in tempo_df.iterrows() if not pd.isna(row.get("ano"))}
+        validos = tempo_df.dropna(subset=["ano"])
+        mapping = dict(zip(validos["ano"].astype(int), validos["tempo_sk"].astype(int)))
         return df["ano_base"].map(mapping).fillna(0).astype(int)
 
     def _map_tema(self, df: pd.DataFrame, dims: Dict[str, pd.DataFrame]) -> pd.Series:
@@ -218,7 +219,8 @@ class FactTitulacaoETL(FactETL):
         if tema_df.empty or "tema_id" not in tema_df.columns:
             return pd.Series(0, index=df.index)
 
-        mapping = {int(row["tema_id"]): int(row["tema_sk"]) for _, row in tema_df.iterrows() if not pd.isna(row.get("tema_id"))}
+        validos = tema_df.dropna(subset=["tema_id"])
+        mapping = dict(zip(validos["tema_id"].astype(int), validos["tema_sk"].astype(int)))
         return df["tema_id"].map(mapping).fillna(0).astype(int)
 
     def _map_titulado(self, df: pd.DataFrame, dims: Dict[str, pd.DataFrame]):
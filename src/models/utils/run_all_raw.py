@@ -8,8 +8,13 @@ Permite rodar todos os scripts ou um subconjunto informado via CLI.
 from __future__ import annotations
 
 import argparse
+import os
 import subprocess
 import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Iterable, List
@@ -45,6 +50,28 @@ RAW_PIPELINES: List[Dict] = [
 
 RAW_MAP = {item["key"]: item for item in RAW_PIPELINES}
 
+# Saída de cada pipeline vai para um arquivo de log (memória constante no
+# orquestrador), em um diretório próprio de cada execução; no terminal
+# aparecem só as últimas linhas
+LOG_DIR_PREFIX = "run_all_raw_"
+LINHAS_LOG_SUCESSO = 20
+LINHAS_LOG_ERRO = 200
+
+# Em execução paralela as linhas de cada pipeline saem prefixadas com a sua
+# chave; a trava evita que linhas de pipelines diferentes se misturem
+_PRINT_LOCK = Lock()
+
+
+def _jobs_positivo(valor: str) -> int:
+    """Tipo do argparse para -j/--jobs: inteiro >= 1."""
+    try:
+        jobs = int(valor)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"'{valor}' não é um inteiro maior ou igual a 1")
+    return jobs
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -65,7 +92,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--show-stdout",
         action="store_true",
-        help="Mostra a saída completa (stdout) dos scripts invocados.",
+        help="Mostra a saída completa (stdout) dos scripts invocados "
+        "(em paralelo, cada linha prefixada com a chave do pipeline).",
+    )
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        help="Executa os pipelines um de cada vez (útil para depuração).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_jobs_positivo,
+        default=None,
+        help="Número máximo de pipelines executados em paralelo (>= 1).",
     )
     return parser.parse_args()
 
@@ -91,66 +131,156 @@ def selecionar_scripts(raws: Iterable[str] | None) -> List[Dict]:
     return selecionados
 
 
-def executar_raw(raws: Iterable[str] | None = None, *, show_stdout: bool = False) -> bool:
+def _imprimir(texto: str, prefixo: str | None) -> None:
+    """Imprime ``texto`` de uma vez, com ``[prefixo]`` em cada linha se informado."""
+    if prefixo:
+        texto = "\n".join(f"[{prefixo}] {linha}" for linha in texto.splitlines())
+    with _PRINT_LOCK:
+        print(texto, flush=True)
+
+
+def _imprimir_final_log(
+    nome: str, log_path: Path, linhas: int, prefixo: str | None = None
+) -> None:
+    """Mostra as últimas ``linhas`` do log sem carregar o arquivo inteiro."""
+    with open(log_path, encoding="utf-8", errors="replace") as log_file:
+        final = deque(log_file, maxlen=linhas)
+    _imprimir(f"[{nome}] log completo: {log_path}\n" + "".join(final).rstrip(), prefixo)
+
+
+def _transmitir_saida(comando: List[str], prefixo: str) -> int:
+    """Executa o comando repassando a saída linha a linha, prefixada."""
+    with subprocess.Popen(
+        comando,
+        cwd=str(project_root),
+        # Sem buffer no filho: as linhas chegam assim que são impressas
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+    ) as processo:
+        for linha in processo.stdout:
+            _imprimir(linha.rstrip("\n"), prefixo)
+    return processo.returncode
+
+
+def _executar_script(
+    script: Dict,
+    show_stdout: bool,
+    paralelo: bool = False,
+    log_dir: Path | None = None,
+) -> Dict:
+    """
+    Executa um pipeline RAW em subprocesso e devolve o resultado para o resumo.
+
+    Com ``paralelo`` o que vai para o terminal sai prefixado com a chave do
+    pipeline, para que a saída de execuções simultâneas continue legível.
+    """
+    prefixo = script["key"] if paralelo else None
+    cabecalho = "\n".join(
+        [
+            "-" * 80,
+            f"Executando: {script['nome']}",
+            f"Descrição: {script['descricao']}",
+            f"Arquivo: {script['caminho']}",
+            "-" * 80,
+        ]
+    )
+    _imprimir(cabecalho, prefixo)
+    try:
+        inicio = datetime.now()
+        script_path = project_root / script["caminho"]
+        if not script_path.exists():
+            raise FileNotFoundError(f"Script não encontrado: {script_path}")
+
+        comando = [sys.executable, str(script_path)]
+        if show_stdout and paralelo:
+            # Saída em tempo real, linha a linha e identificada pelo pipeline
+            returncode = _transmitir_saida(comando, prefixo)
+        elif show_stdout:
+            # Saída direto no terminal, em tempo real
+            returncode = subprocess.run(comando, cwd=str(project_root)).returncode
+        else:
+            log_path = log_dir / f"{script['key']}.log"
+            with open(log_path, "wb") as log_file:
+                returncode = subprocess.run(
+                    comando,
+                    cwd=str(project_root),
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                ).returncode
+            _imprimir_final_log(
+                script["nome"],
+                log_path,
+                LINHAS_LOG_SUCESSO if returncode == 0 else LINHAS_LOG_ERRO,
+                prefixo,
+            )
+
+        if returncode != 0:
+            raise RuntimeError(f"Código de saída: {returncode}")
+
+        fim = datetime.now()
+        tempo = (fim - inicio).total_seconds()
+
+        _imprimir(f"✅ {script['nome']} concluído com sucesso em {tempo:.2f}s\n", prefixo)
+        return {
+            "script": script["nome"],
+            "status": "SUCESSO ✅",
+            "tempo": f"{tempo:.2f}s",
+        }
+
+    except Exception as exc:  # pylint: disable=broad-except
+        _imprimir(f"❌ Erro ao executar {script['nome']}: {exc}\n", prefixo)
+        return {
+            "script": script["nome"],
+            "status": f"ERRO ❌: {str(exc)[:60]}",
+            "tempo": "-",
+        }
+
+
+def executar_raw(
+    raws: Iterable[str] | None = None,
+    *,
+    show_stdout: bool = False,
+    serial: bool = False,
+    jobs: int | None = None,
+) -> bool:
     scripts = selecionar_scripts(raws)
 
     print("=" * 80)
     print("EXECUTANDO CAMADA RAW")
     print("=" * 80)
-    print(f"Início: {datetime.now():%Y-%m-%d %H:%M:%S}\n")
-
-    resultados = []
-
-    for script in scripts:
-        print("-" * 80)
-        print(f"Executando: {script['nome']}")
-        print(f"Descrição: {script['descricao']}")
-        print(f"Arquivo: {script['caminho']}")
-        print("-" * 80)
-        try:
-            inicio = datetime.now()
-            script_path = project_root / script["caminho"]
-            if not script_path.exists():
-                raise FileNotFoundError(f"Script não encontrado: {script_path}")
-
-            resultado = subprocess.run(
-                [sys.executable, str(script_path)],
-                cwd=str(project_root),
-                capture_output=not show_stdout,
-                text=True,
-            )
-
-            if show_stdout and resultado.stdout:
-                print(resultado.stdout)
-            elif resultado.stdout:
-                print(resultado.stdout.strip())
-
-            if resultado.returncode != 0:
-                if resultado.stderr:
-                    print(resultado.stderr)
-                raise RuntimeError(f"Código de saída: {resultado.returncode}")
-
-            fim = datetime.now()
-            tempo = (fim - inicio).total_seconds()
-
-            resultados.append(
-                {
-                    "script": script["nome"],
-                    "status": "SUCESSO ✅",
-                    "tempo": f"{tempo:.2f}s",
-                }
-            )
-            print(f"✅ {script['nome']} concluído com sucesso em {tempo:.2f}s\n")
-
-        except Exception as exc:  # pylint: disable=broad-except
-            resultados.append(
-                {
-                    "script": script["nome"],
-                    "status": f"ERRO ❌: {str(exc)[:60]}",
-                    "tempo": "-",
-                }
+    print(f"Início: {datetime.now():%Y-%m-%d %H:%M:%S}")
+    log_dir = None
+    if not show_stdout:
+        # Diretório exclusivo desta execução: execuções simultâneas (ou de
+        # outros usuários) não sobrescrevem os logs umas das outras
+        log_dir = Path(tempfile.mkdtemp(prefix=LOG_DIR_PREFIX))
+        print(f"Logs: {log_dir}")
+    print()
+
+    # Os pipelines RAW são independentes entre si (cada um lê sua própria
+    # fonte e recria sua própria tabela): rodam em paralelo, um subprocesso
+    # por pipeline, com a saída prefixada pela chave; o resumo mantém a ordem
+    # de execução configurada
+    if serial or len(scripts) <= 1:
+        resultados = [
+            _executar_script(script, show_stdout, log_dir=log_dir) for script in scripts
+        ]
+    else:
+        max_workers = jobs or len(scripts)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            resultados = list(
+                executor.map(
+                    lambda script: _executar_script(
+                        script, show_stdout, paralelo=True, log_dir=log_dir
+                    ),
+                    scripts,
+                )
             )
-            print(f"❌ Erro ao executar {script['nome']}: {exc}\n")
 
     _imprimir_resumo(resultados)
     erros = len([r for r in resultados if "ERRO" in r["status"]])
@@ -192,7 +322,12 @@ def main() -> None:
         sys.exit(0)
 
     try:
-        sucesso = executar_raw(args.raws, show_stdout=args.show_stdout)
+        sucesso = executar_raw(
+            args.raws,
+            show_stdout=args.show_stdout,
+            serial=args.serial,
+            jobs=args.jobs,
+        )
         sys.exit(0 if sucesso else 1)
     except ValueError as err:
         print(f"❌ {err}")
@@ -6,4 +6,4 @@ na nomenclatura de colunas, convenções de surrogate keys e execução dos
 pipelines de ETL.
 """
 
-__all__ = ["naming_conventions", "etl_base"]
+__all__ = ["naming_conventions", "etl_base", "pg_staging", "http_retry"]
@@ -0,0 +1,34 @@
+"""
+Política de retry das chamadas HTTP à API de Dados Abertos da CAPES.
+
+Compartilhada pelo CapesAPI (src/core) e pelos scripts RAW de staging; o
+módulo não depende de src.core, então importá-lo não configura logging nem
+carrega o .env.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from urllib3.util.retry import Retry
+
+# Erros transitórios do servidor e 429, com backoff exponencial e
+# respeitando Retry-After
+API_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def build_api_retry(total: Optional[int] = None) -> Retry:
+    """Retry do urllib3 para as sessões HTTP que acessam a API da CAPES.
+
+    Sem ``total``, usa a variável de ambiente MAX_RETRIES (padrão 3), a mesma
+    lida por ``Config.MAX_RETRIES``.
+    """
+    if total is None:
+        total = int(os.getenv("MAX_RETRIES", "3"))
+    return Retry(
+        total=total,
+        backoff_factor=1,
+        status_forcelist=API_RETRY_STATUS,
+        respect_retry_after_header=True,
+    )
@@ -0,0 +1,106 @@
+"""
+Carga em massa no PostgreSQL - COPY FROM STDIN para as tabelas de staging
+Observatório CAPES - Pós-graduação brasileira
+"""
+
+import csv
+import io
+from itertools import islice
+
+import pandas as pd
+
+# Tabelas raw são recriadas a cada execução: como UNLOGGED a carga não escreve
+# no WAL (após um crash a tabela volta vazia; basta reexecutar o script RAW)
+UNLOGGED_STAGING = True
+
+
+class _CsvNull(int):
+    """None para o csv.writer: numérico (sai sem aspas) e escrito como vazio."""
+    __slots__ = ()
+
+    def __str__(self):
+        return ''
+
+
+_CSV_NULL = _CsvNull()
+
+
+def _csv_writer(buffer):
+    """
+    Escritor CSV no formato do COPY: None sai como campo vazio sem aspas (NULL)
+    e qualquer texto entre aspas, inclusive '' (mantido como string vazia).
+
+    Devolve ``(writer, converter)``; ``converter`` prepara cada linha (ou é
+    None quando o próprio csv.writer já distingue None de '').
+    """
+    if hasattr(csv, 'QUOTE_NOTNULL'):  # Python 3.12+
+        return csv.writer(buffer, quoting=csv.QUOTE_NOTNULL), None
+    # Antes do 3.12: QUOTE_NONNUMERIC põe aspas nos textos, e o None vira um
+    # "número" que se escreve vazio (o None puro sairia como "")
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    return writer, lambda row: [_CSV_NULL if v is None else v for v in row]
+
+
+class CsvRowStream(io.TextIOBase):
+    """
+    Arquivo somente-leitura que serializa as linhas em CSV sob demanda.
+
+    Entregue ao copy_expert, que o consome com read(n): só um bloco de
+    ``block_rows`` linhas fica em memória por vez, em vez do bloco inteiro.
+    """
+
+    def __init__(self, rows, block_rows=1000):
+        self._blocks = self._iter_blocks(iter(rows), block_rows)
+        self._buffer = ''
+        self._pos = 0
+
+    @staticmethod
+    def _iter_blocks(rows, block_rows):
+        buffer = io.StringIO()
+        writer, converter = _csv_writer(buffer)
+        for batch in iter(lambda: list(islice(rows, block_rows)), []):
+            writer.writerows(batch if converter is None else map(converter, batch))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        parts = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self._pos >= len(self._buffer):
+                self._buffer = next(self._blocks, '')
+                self._pos = 0
+                if not self._buffer:
+                    break
+            end = len(self._buffer) if size < 0 else min(len(self._buffer), self._pos + remaining)
+            parts.append(self._buffer[self._pos:end])
+            remaining -= end - self._pos
+            self._pos = end
+        return ''.join(parts)
+
+
+def pg_copy(table, conn, keys, data_iter):
+    """
+    Método de inserção para ``DataFrame.to_sql`` usando ``COPY ... FROM STDIN``.
+
+    Segue a assinatura ``(table, conn, keys, data_iter)`` esperada pelo pandas;
+    o DDL continua a cargo de quem chama, apenas a carga das linhas muda.
+    """
+    columns = ', '.join(f'"{k}"' for k in keys)
+    table_name = f'{table.schema}.{table.name}' if table.schema else table.name
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(
+            f'COPY {table_name} ({columns}) FROM STDIN WITH CSV', CsvRowStream(data_iter)
+        )
+
+
+def staging_table_ddl(df, table_name, con):
+    """CREATE TABLE gerado pelo pandas para ``df``, como UNLOGGED se configurado."""
+    create_sql = pd.io.sql.get_schema(df, table_name, con=con)
+    if UNLOGGED_STAGING:
+        create_sql = create_sql.replace('CREATE TABLE', 'CREATE UNLOGGED TABLE', 1)
+    return create_sql
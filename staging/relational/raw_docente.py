@@ -15,6 +15,7 @@ import sys
 from pathlib import Path
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
 # Garantir que o diretório raiz esteja no PYTHONPATH (execução via CLI)
@@ -123,7 +124,10 @@ def load_and_consolidate_docente_files(data_dir: Path) -> pd.DataFrame:
                 df = pd.read_csv(file_path, encoding="latin-1", sep=";", dtype=str, engine="python")
 
             df = normalize_column_names(df)
-            df["fonte_arquivo"] = file_name
+            # Categórica de uma única categoria: código int8 por linha em vez de uma string
+            df["fonte_arquivo"] = pd.Categorical.from_codes(
+                np.zeros(len(df), dtype=np.int8), categories=[file_name]
+            )
             df["created_at"] = pd.Timestamp.now().normalize()
 
             print(f"   ✔ {len(df):,} registros carregados")
@@ -136,16 +140,21 @@ def load_and_consolidate_docente_files(data_dir: Path) -> pd.DataFrame:
         raise ValueError("Nenhum arquivo foi processado com sucesso")
 
     print(f"\n🔄 Consolidando {total_records:,} registros de {len(frames)} arquivos...")
-    return pd.concat(frames, ignore_index=True)
+    df_consolidado = pd.concat(frames, ignore_index=True)
+    # Categorias distintas por arquivo viram object no concat; recodifica em uma única categórica
+    df_consolidado["fonte_arquivo"] = df_consolidado["fonte_arquivo"].astype("category")
+    return df_consolidado
 
 
 def clean_and_deduplicate(df: pd.DataFrame) -> pd.DataFrame:
     """Executa rotinas de limpeza, tipagem e deduplicação."""
     print("🧹 Limpando dados...")
 
-    for col in df.columns:
-        if df[col].dtype == object and col not in ["fonte_arquivo", "created_at"]:
-            df[col] = df[col].fillna("").astype(str).str.strip()
+    # Colunas de texto selecionadas uma vez e limpas em uma única atribuição
+    text_cols = df.select_dtypes(include=["object", "string"]).columns.difference(
+        ["fonte_arquivo", "created_at"], sort=False
+    )
+    df[text_cols] = df[text_cols].fillna("").astype(str).apply(lambda s: s.str.strip())
 
     numeric_cols = [
         "ano_base",
@@ -8,6 +8,7 @@ import argparse
 import os
 from pathlib import Path
 from typing import Dict
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 CSV_NAME = "Planilha_Mapa_Fomento_PQ.xlsx - Sheet 1.csv"
@@ -74,9 +75,8 @@ def load_raw_dataframe(csv_path: Path) -> pd.DataFrame:
     }
     df = df.rename(columns={old: new for old, new in rename_map.items() if old in df.columns})
     # Limpeza básica dos textos
-    for col in df.columns:
-        if df[col].dtype == object:
-            df[col] = df[col].fillna("").astype(str).str.strip()
+    text_cols = df.select_dtypes(include=["object", "string"]).columns
+    df[text_cols] = df[text_cols].fillna("").astype(str).apply(lambda s: s.str.strip())
     # Conversões específicas
     # Converte id_registro para numérico, mantendo NaN como valores nulos
     df["id_registro"] = pd.to_numeric(df["id_registro"], errors="coerce")
@@ -89,7 +89,9 @@ def load_raw_dataframe(csv_path: Path) -> pd.DataFrame:
     for col in ("data_inicio_processo", "data_termino_processo"):
         if col in df.columns:
             df[col] = pd.to_datetime(df[col], format="%d/%m/%Y", errors="coerce")
-    df["fonte_arquivo"] = csv_path.name
+    df["fonte_arquivo"] = pd.Categorical.from_codes(
+        np.zeros(len(df), dtype=np.int8), categories=[csv_path.name]
+    )
     df["created_at"] = pd.Timestamp.now().normalize()
     ordered_cols = [
         "id_registro",
@@ -7,51 +7,91 @@ diretamente do Portal de Dados Abertos da CAPES, processa-os e os salva
 em uma tabela 'raw_ies_api' no banco de dados PostgreSQL.
 """
 
+import math
 import os
+import re
 import sys
+import unicodedata
 import pandas as pd
+import pyarrow as pa
 import requests
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
+from functools import lru_cache
 from pathlib import Path
 
+# orjson (opcional) decodifica as respostas JSON da API bem mais rápido que o json da stdlib
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Garantir que o diretório raiz esteja no PYTHONPATH (execução via CLI)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.http_retry import build_api_retry
+from src.utils.pg_staging import pg_copy, staging_table_ddl
+
 # --- Funções de Utilidade (Poderiam estar em src/core/utils.py) ---
 # Incluídas aqui para tornar o script autocontido e fácil de executar.
 
+# Padrões e substituições usados na padronização dos nomes de colunas,
+# compilados uma única vez no carregamento do módulo.
+_RE_CARACTERES_INVALIDOS = re.compile(r'[^a-z0-9\s_]')
+_RE_ESPACOS = re.compile(r'\s+')
+
+# (trecho original, substituto, aplicar apenas quando for prefixo) — a ordem importa
+_SUBSTITUICOES_COLUNAS = (
+    ('codigo', 'cod', False),
+    ('cd_', 'cod_', True),
+    ('ds_', 'des_', True),
+    ('nm_', 'des_', True),
+    ('nome', 'des', False),
+    ('quantidade', 'qtd', False),
+)
+
+def _padronizar_nome(col) -> str:
+    """Aplica as regras de padronização a um único nome de coluna."""
+    s = str(col).strip().lower()
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
+    s = _RE_CARACTERES_INVALIDOS.sub('', s)
+    s = _RE_ESPACOS.sub('_', s)
+
+    for antigo, novo, apenas_prefixo in _SUBSTITUICOES_COLUNAS:
+        if not apenas_prefixo or s.startswith(antigo):
+            s = s.replace(antigo, novo)
+
+    if s.endswith('_id'):
+        s = s.replace('_id', '_id_original')
+
+    return s
+
 def padronizar_nomes_colunas(df: pd.DataFrame) -> pd.DataFrame:
     """Aplica um conjunto completo de regras de padronização aos nomes das colunas."""
-    import re
-    import unicodedata
-    
-    colunas_renomeadas = {}
-    for col in df.columns:
-        s = str(col).strip().lower()
-        s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('utf-8')
-        s = re.sub(r'[^a-z0-9\s_]', '', s)
-        s = re.sub(r'\s+', '_', s)
-
-        if 'codigo' in s: s = s.replace('codigo', 'cod')
-        if s.startswith('cd_'): s = s.replace('cd_', 'cod_')
-        if s.startswith('ds_'): s = s.replace('ds_', 'des_')
-        if s.startswith('nm_'): s = s.replace('nm_', 'des_')
-        if 'nome' in s: s = s.replace('nome', 'des')
-        if 'quantidade' in s: s = s.replace('quantidade', 'qtd')
-        
-        if s.endswith('_id'):
-            s = s.replace('_id', '_id_original')
-        
-        colunas_renomeadas[col] = s
-        
-    df = df.rename(columns=colunas_renomeadas)
-    return df
+    colunas_renomeadas = {col: _padronizar_nome(col) for col in df.columns}
+    return df.rename(columns=colunas_renomeadas)
 
 def limpar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Executa uma limpeza geral em um DataFrame."""
-    df.dropna(axis=1, how='all', inplace=True)
-    df.dropna(axis=0, how='all', inplace=True)
+    # Uma única máscara de nulos decide as colunas e as linhas totalmente vazias
+    # (equivale aos dois dropna(how='all'), com uma varredura em vez de duas)
+    preenchido = df.notna()
+    df = df.drop(
+        index=df.index[~preenchido.any(axis=1).to_numpy()],
+        columns=df.columns[~preenchido.any(axis=0).to_numpy()],
+    )
+
+    # Colunas texto passam a string[pyarrow]: strip e isin rodam nos kernels do Arrow
+    text_cols = df.select_dtypes(include=['object', 'string']).columns
+    df[text_cols] = df[text_cols].astype('string[pyarrow]')
 
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].str.strip().replace(['', 'nan', 'NaN', 'NULL'], None)
+    for col in text_cols:
+        df[col] = df[col].str.strip()
+        df[col] = df[col].mask(df[col].isin(['', 'nan', 'NaN', 'NULL']), pd.NA)
         
     return df
 
@@ -60,14 +100,16 @@ def definir_schema_tabela(df: pd.DataFrame, schema_desejado: dict) -> pd.DataFra
     schema_aplicavel = {k: v for k, v in schema_desejado.items() if k in df.columns}
     df_convertido = df.astype(schema_aplicavel, errors='ignore')
     
-    for col, dtype in schema_aplicavel.items():
-        if dtype == 'Int64':
-            df_convertido[col] = pd.to_numeric(df_convertido[col], errors='coerce').astype('Int64')
+    # Conversão numérica das colunas Int64 em um único bloco
+    int_cols = [col for col, dtype in schema_aplicavel.items() if dtype == 'Int64']
+    if int_cols:
+        df_convertido[int_cols] = df_convertido[int_cols].apply(pd.to_numeric, errors='coerce').astype('Int64')
             
     return df_convertido
 
 # --- Lógica Principal do Script ---
 
+@lru_cache(maxsize=1)
 def get_project_root() -> Path:
     """Encontra o diretório raiz do projeto de forma robusta."""
     current_path = Path(__file__).resolve()
@@ -75,8 +117,9 @@ def get_project_root() -> Path:
         current_path = current_path.parent
     return current_path
 
+@lru_cache(maxsize=1)
 def get_db_engine():
-    """Conecta ao PostgreSQL usando variáveis de ambiente."""
+    """Conecta ao PostgreSQL usando variáveis de ambiente (engine reaproveitada no processo)."""
     project_root = get_project_root()
     load_dotenv(dotenv_path=project_root / '.env')
     
@@ -91,7 +134,10 @@ def get_db_engine():
 
     db_uri = f'postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}'
     try:
-        engine = create_engine(db_uri)
+        engine = create_engine(
+            db_uri,
+            pool_pre_ping=True,
+        )
         with engine.connect() as connection:
             print(f"Conexão com o banco '{db_name}' estabelecida com sucesso.")
         return engine
@@ -99,59 +145,181 @@ def get_db_engine():
         print(f"ERRO: Falha ao conectar com o banco de dados: {e}")
         raise
 
-def fetch_all_from_api(resource_id: str, api_url: str) -> pd.DataFrame:
+def _build_session() -> requests.Session:
+    """
+    Cria uma sessão HTTP compartilhada com pool de conexões, retry com backoff
+    e compressão gzip habilitada (o requests descompacta de forma transparente).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        max_retries=build_api_retry(),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+_SESSION = _build_session()
+
+# Tipos do datastore CKAN ('result.fields') -> dtypes pandas equivalentes
+_CKAN_DTYPES = {
+    'text': 'string[pyarrow]',
+    'int': 'Int64',
+    'int4': 'Int64',
+    'int8': 'Int64',
+    'numeric': 'Float64',
+    'float8': 'Float64',
+    'timestamp': 'datetime64[ns]',
+}
+
+# Tipos do datastore CKAN -> tipos Arrow aplicados a todas as páginas; sem
+# isso cada página infere o seu (ex.: int64 em uma, double em outra) e o
+# concat_tables falha. Tipos fora do mapa ficam com a inferência do Arrow
+_CKAN_ARROW_TYPES = {
+    'text': pa.string(),
+    'int': pa.int64(),
+    'int4': pa.int64(),
+    'int8': pa.int64(),
+    'numeric': pa.float64(),
+    'float8': pa.float64(),
+}
+
+def _page_to_arrow(records: list, arrow_types: dict) -> pa.Table:
+    """Converte uma página de registros em tabela Arrow com os tipos do CKAN."""
+    table = pa.Table.from_pylist(records)
+    for i, name in enumerate(table.column_names):
+        target = arrow_types.get(name)
+        if target is not None and table.schema.field(i).type != target:
+            # cast seguro: '5' -> 5, 5 -> 5.0 e 5 -> '5'; valor incompatível gera erro
+            table = table.set_column(i, name, table.column(i).cast(target))
+    return table
+
+def _fetch_page(api_url: str, resource_id: str, limit: int, offset: int) -> dict:
+    """Busca uma única página do datastore_search e retorna o bloco 'result'."""
+    params = {'resource_id': resource_id, 'limit': limit, 'offset': offset}
+    response = _SESSION.get(api_url, params=params, timeout=60)
+    response.raise_for_status()
+    data = _json.loads(response.content)
+
+    if not data.get('success'):
+        raise RuntimeError(f"A API retornou um erro: {data.get('error')}")
+
+    return data.get('result', {})
+
+def fetch_all_from_api(resource_id: str, api_url: str, max_workers: int = 8) -> pd.DataFrame:
     """
     Busca todos os registros de um recurso na API CKAN da CAPES, lidando com paginação.
+
+    A primeira página informa o total de registros ('result.total'); as páginas
+    restantes são buscadas em paralelo (até ``max_workers`` requisições simultâneas).
     """
     print(f"Iniciando extração da API para o resource_id: {resource_id}")
-    all_records = []
-    offset = 0
     limit = 5000  # Aumentar o limite por requisição para mais eficiência
 
-    while True:
-        params = {'resource_id': resource_id, 'limit': limit, 'offset': offset}
-        try:
-            response = requests.get(api_url, params=params, timeout=60)
-            response.raise_for_status()
-            data = response.json()
-
-            if not data.get('success'):
-                print(f"ERRO: A API retornou um erro: {data.get('error')}")
-                break
-
-            records = data.get('result', {}).get('records', [])
-            if not records:
-                print("Extração concluída. Não há mais registros a serem buscados.")
-                break
-
-            all_records.extend(records)
-            print(f"  - Registros buscados: {len(all_records):,}")
-            offset += limit
-
-        except requests.exceptions.RequestException as e:
-            print(f"ERRO: Falha na requisição à API: {e}")
-            break
-        except Exception as e:
-            print(f"ERRO: Ocorreu um erro inesperado durante a extração: {e}")
-            break
-            
-    if not all_records:
+    # Sem a primeira página não há total nem schema: a extração falha como
+    # qualquer outra página perdida (um DataFrame vazio passaria como sucesso)
+    try:
+        first_page = _fetch_page(api_url, resource_id, limit, 0)
+    except requests.exceptions.RequestException as e:
+        print(f"ERRO: Falha na requisição à API (offset=0): {e}")
+        raise RuntimeError("A primeira página da API falhou; raw_ies não será substituída") from e
+    except Exception as e:
+        print(f"ERRO: Ocorreu um erro inesperado durante a extração (offset=0): {e}")
+        raise RuntimeError("A primeira página da API falhou; raw_ies não será substituída") from e
+
+    first_records = first_page.get('records', [])
+    total = first_page.get('total', len(first_records))
+    n_pages = math.ceil(total / limit)
+    print(f"  - Total informado pela API: {total:,} registros em {n_pages} página(s)")
+
+    # O schema declarado pelo CKAN define a ordem das colunas e os dtypes finais,
+    # evitando a inferência sobre todos os registros
+    fields = first_page.get('fields', [])
+    columns = [f['id'] for f in fields]
+    dtype_map = {f['id']: _CKAN_DTYPES[f.get('type')] for f in fields if f.get('type') in _CKAN_DTYPES}
+    arrow_types = {f['id']: _CKAN_ARROW_TYPES[f.get('type')] for f in fields if f.get('type') in _CKAN_ARROW_TYPES}
+    fetched = len(first_records)
+    print(f"  - Registros buscados: {fetched:,}/{total:,}")
+
+    # Cada página é convertida para uma tabela Arrow assim que chega, sem manter
+    # a lista de dicionários acumulada ao lado do DataFrame final.
+    pages = {0: _page_to_arrow(first_records, arrow_types)} if first_records else {}
+
+    # As páginas restantes são conhecidas de antemão: nenhuma requisição extra
+    # é feita para descobrir uma página vazia ao final
+    offsets = [page * limit for page in range(1, n_pages)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(offsets)))) as executor:
+        futures = {
+            executor.submit(_fetch_page, api_url, resource_id, limit, offset): offset
+            for offset in offsets
+        }
+        failed_offsets = []
+        for future in as_completed(futures):
+            offset = futures[future]
+            try:
+                records = future.result().get('records', [])
+            except requests.exceptions.RequestException as e:
+                print(f"ERRO: Falha na requisição à API (offset={offset}): {e}")
+                failed_offsets.append(offset)
+                continue
+            except Exception as e:
+                print(f"ERRO: Ocorreu um erro inesperado durante a extração (offset={offset}): {e}")
+                failed_offsets.append(offset)
+                continue
+            if records:
+                pages[offset] = _page_to_arrow(records, arrow_types)
+            fetched += len(records)
+            print(f"  - Registros buscados: {fetched:,}/{total:,} (offset={offset:,})")
+
+    # Extração incompleta não pode substituir raw_ies (a tabela é recriada do zero)
+    if failed_offsets:
+        raise RuntimeError(
+            f"{len(failed_offsets)} página(s) da API falharam "
+            f"(offsets {sorted(failed_offsets)}); raw_ies não será substituída"
+        )
+    if fetched != total:
+        raise RuntimeError(
+            f"A API informou {total:,} registros, mas {fetched:,} foram buscados; "
+            "raw_ies não será substituída"
+        )
+
+    if not pages:
         return pd.DataFrame()
 
-    return pd.DataFrame(all_records)
+    # Reagrupa as páginas na ordem dos offsets, independente da ordem de conclusão;
+    # 'permissive' unifica as colunas sem tipo CKAN (ex.: toda nula em uma página)
+    table = pa.concat_tables([pages[offset] for offset in sorted(pages)], promote_options='permissive')
+    print(f"Extração concluída. Total de registros buscados: {table.num_rows:,}")
+
+    if columns:
+        table = table.select([col for col in columns if col in table.column_names])
+
+    df = table.to_pandas(self_destruct=True)
+    return df.astype({k: v for k, v in dtype_map.items() if k in df.columns}, errors='ignore')
 
 def save_to_postgres(df: pd.DataFrame, engine, table_name: str):
     """Salva o DataFrame final no PostgreSQL."""
     print(f"Salvando dados na tabela 'public.{table_name}'...")
     try:
-        df.to_sql(
-            table_name,
-            engine,
-            if_exists='replace',
-            index=False,
-            method='multi',
-            chunksize=5000
-        )
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+
+            # DDL gerado pelo próprio pandas, criado antes da carga para permitir UNLOGGED
+            conn.execute(text(staging_table_ddl(df, table_name, conn)))
+
+            df.to_sql(
+                table_name,
+                conn,
+                if_exists='append',
+                index=False,
+                method=pg_copy,
+                chunksize=50000
+            )
+
+            # Estatísticas atualizadas para as consultas das camadas seguintes
+            conn.execute(text(f"ANALYZE {table_name}"))
         print(f"SUCESSO: Tabela '{table_name}' criada/atualizada com {len(df):,} registros.")
     except Exception as e:
         print(f"ERRO: Falha ao salvar os dados no banco: {e}")
@@ -199,6 +367,7 @@ def main():
 
     except Exception as e:
         print(f"\nO processo falhou. Motivo: {e}")
+        sys.exit(1)
     
     print("\nProcesso concluído.")
 
@@ -8,13 +8,23 @@ Prioriza uso de APIs REST ao invés de downloads de CSV
 import os
 import sys
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, List, Optional
-import json
+
+# Decodificador JSON: orjson quando instalado (parser em C), senão o json padrão
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 # Configurar logging
 logging.basicConfig(
@@ -27,6 +37,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Garantir que o diretório raiz esteja no PYTHONPATH (execução via CLI)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.http_retry import build_api_retry
+from src.utils.pg_staging import UNLOGGED_STAGING
+
+# Tipos das colunas conhecidas de raw_ies_api (demais colunas ficam como TEXT)
+RAW_IES_API_COLUMN_TYPES = {
+    'cd_entidade_ensino': 'BIGINT',
+    'cd_entidade_capes': 'BIGINT',
+    'cd_entidade_emec': 'BIGINT',
+    'nm_entidade_ensino': 'TEXT',
+    'sg_entidade_ensino': 'VARCHAR(20)',
+    'ds_dependencia_administrativa': 'VARCHAR(100)',
+    'cs_status_juridico': 'VARCHAR(100)',
+    'nm_municipio_entidade_ensino': 'VARCHAR(200)',
+    'sg_uf_entidade_ensino': 'VARCHAR(2)',
+    'nm_regiao_entidade_ensino': 'VARCHAR(50)',
+    'ano_referencia': 'INTEGER',
+    'an_base': 'INTEGER',
+    'created_at': 'TIMESTAMP'
+}
+
+# Variações comuns dos nomes das colunas de IES; o primeiro nome de cada
+# grupo é usado como padrão
+IES_COLUMN_VARIANTS = (
+    ('NM_ENTIDADE_ENSINO', 'nm_entidade_ensino', 'nome_entidade', 'ies_nome'),
+    ('SG_ENTIDADE_ENSINO', 'sg_entidade_ensino', 'sigla_entidade', 'ies_sigla'),
+    ('CD_ENTIDADE_ENSINO', 'cd_entidade_ensino', 'codigo_entidade', 'ies_codigo'),
+    ('CD_ENTIDADE_CAPES', 'cd_entidade_capes', 'codigo_capes'),
+    ('CD_ENTIDADE_EMEC', 'cd_entidade_emec', 'codigo_emec'),
+    ('DS_DEPENDENCIA_ADMINISTRATIVA', 'ds_dependencia_administrativa', 'dependencia'),
+    ('CS_STATUS_JURIDICO', 'cs_status_juridico', 'status_juridico'),
+    ('NM_MUNICIPIO_ENTIDADE_ENSINO', 'nm_municipio_entidade_ensino', 'municipio'),
+    ('SG_UF_ENTIDADE_ENSINO', 'sg_uf_entidade_ensino', 'uf'),
+    ('NM_REGIAO_ENTIDADE_ENSINO', 'nm_regiao_entidade_ensino', 'regiao'),
+    ('AN_BASE', 'an_base', 'ano_base')
+)
+
+# Colunas de domínio pequeno e fixo (UF ≤ 27, regiões, dependência,
+# status jurídico): armazenadas como category, com códigos inteiros
+IES_CATEGORY_COLUMNS = (
+    'DS_DEPENDENCIA_ADMINISTRATIVA', 'CS_STATUS_JURIDICO',
+    'SG_UF_ENTIDADE_ENSINO', 'NM_REGIAO_ENTIDADE_ENSINO'
+)
+
+# variação -> nome padrão, na ordem de prioridade de IES_COLUMN_VARIANTS
+_VARIANT_TO_STANDARD = {
+    variant: variants[0] for variants in IES_COLUMN_VARIANTS for variant in variants
+}
+
 class CAPESAPIClient:
     """Cliente para interação com APIs da CAPES"""
     
@@ -35,9 +98,19 @@ class CAPESAPIClient:
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'UFMS-Research-Bot/1.0',
-            'Accept': 'application/json,text/csv,application/xml'
+            'Accept': 'application/json,text/csv,application/xml',
+            'Accept-Encoding': 'gzip, deflate'
         })
         
+        # Pool de conexões reutilizáveis com retry/backoff para erros transitórios
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=build_api_retry()
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
     def get_dataset_info(self, dataset_id: str) -> Optional[Dict]:
         """Obtém informações sobre um dataset específico"""
         try:
@@ -48,7 +121,7 @@ class CAPESAPIClient:
             response = self.session.get(url, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = _json.loads(response.content)
             if data.get('success'):
                 return data.get('result')
             else:
@@ -73,7 +146,7 @@ class CAPESAPIClient:
             response = self.session.get(url, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = _json.loads(response.content)
             if data.get('success'):
                 results = data.get('result', {})
                 datasets = results.get('results', [])
@@ -101,7 +174,7 @@ class CAPESAPIClient:
             response = self.session.get(url, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = _json.loads(response.content)
             if data.get('success'):
                 result = data.get('result', {})
                 records = result.get('records', [])
@@ -136,7 +209,7 @@ class CAPESAPIClient:
             response = self.session.get(url, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = _json.loads(response.content)
             if data.get('success'):
                 results = data.get('result', {})
                 datasets = results.get('results', [])
@@ -161,19 +234,37 @@ class CAPESAPIClient:
             logger.error(f"❌ Erro ao buscar datasets com API: {str(e)}")
             return []
 
-def load_database_config():
-    """Carrega configuração do banco de dados"""
+@dataclass(frozen=True)
+class DatabaseConfig:
+    """Configuração do banco de dados, com a DSN já montada"""
+    host: str
+    port: str
+    database: str
+    username: str
+    password: str
+    dsn: str
+
+@lru_cache(maxsize=1)
+def load_database_config() -> DatabaseConfig:
+    """Carrega configuração do banco de dados (lida uma única vez por processo)"""
     load_dotenv()
     
-    return {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'port': os.getenv('DB_PORT', '5433'),
-        'database': os.getenv('DB_NAME', 'dw_oesnpg'),
-        'username': os.getenv('DB_USER', 'postgres'),
-        'password': os.getenv('DB_PASS', 'postgres')
-    }
+    host = os.getenv('DB_HOST', 'localhost')
+    port = os.getenv('DB_PORT', '5433')
+    database = os.getenv('DB_NAME', 'dw_oesnpg')
+    username = os.getenv('DB_USER', 'postgres')
+    password = os.getenv('DB_PASS', 'postgres')
+    
+    return DatabaseConfig(
+        host=host,
+        port=port,
+        database=database,
+        username=username,
+        password=password,
+        dsn=f"postgresql://{username}:{password}@{host}:{port}/{database}"
+    )
 
-def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2021, 2022, 2023]) -> pd.DataFrame:
+def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2021, 2022, 2023], max_workers: int = 8) -> pd.DataFrame:
     """Extrai dados de IES a partir dos datasets de programas via API CKAN"""
     
     logger.info("🏛️ EXTRAINDO DADOS DE IES VIA API CKAN")
@@ -186,7 +277,8 @@ def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2
         logger.error("❌ Nenhum dataset com API encontrado")
         return pd.DataFrame()
     
-    all_ies_data = []
+    # 1ª passada: coletar os resources elegíveis (id, nome, ano de referência)
+    tasks = []
     
     # Processar cada dataset encontrado
     for dataset in datasets:
@@ -213,69 +305,59 @@ def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2
             # Filtrar por anos se especificado no nome
             if years and not any(str(year) in resource_name for year in years):
                 continue
-                
-            logger.info(f"� Consultando resource via API: {resource_name}")
             
-            # Obter dados via API CKAN
-            df = client.get_resource_data_via_api(resource_id)
+            # Extrair ano do nome do resource
+            year = None
+            for y in years:
+                if str(y) in resource_name:
+                    year = y
+                    break
+            
+            tasks.append((resource_id, resource_name, year))
+    
+    # 2ª passada: consultar os resources em paralelo; rate limit e falhas
+    # transitórias ficam a cargo do Retry configurado na sessão do cliente
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for index, (resource_id, resource_name, year) in enumerate(tasks):
+            logger.info(f"📡 Consultando resource via API: {resource_name}")
+            futures[executor.submit(client.get_resource_data_via_api, resource_id)] = index
+        
+        for future in as_completed(futures):
+            index = futures[future]
+            _, resource_name, year = tasks[index]
+            df = future.result()
+            
+            if df is None or len(df) == 0:
+                continue
+            
+            # Encontrar colunas existentes (primeira variação presente de cada grupo)
+            cols_set = set(df.columns)
+            column_mapping = {}
+            for variant, standard_name in _VARIANT_TO_STANDARD.items():
+                if variant in cols_set and standard_name not in column_mapping.values():
+                    column_mapping[variant] = standard_name
             
-            if df is not None and len(df) > 0:
-                # Procurar colunas de IES (diferentes variações de nomes)
-                ies_columns_variants = [
-                    # Variações comuns dos nomes das colunas
-                    ['NM_ENTIDADE_ENSINO', 'nm_entidade_ensino', 'nome_entidade', 'ies_nome'],
-                    ['SG_ENTIDADE_ENSINO', 'sg_entidade_ensino', 'sigla_entidade', 'ies_sigla'],
-                    ['CD_ENTIDADE_ENSINO', 'cd_entidade_ensino', 'codigo_entidade', 'ies_codigo'],
-                    ['CD_ENTIDADE_CAPES', 'cd_entidade_capes', 'codigo_capes'],
-                    ['CD_ENTIDADE_EMEC', 'cd_entidade_emec', 'codigo_emec'],
-                    ['DS_DEPENDENCIA_ADMINISTRATIVA', 'ds_dependencia_administrativa', 'dependencia'],
-                    ['CS_STATUS_JURIDICO', 'cs_status_juridico', 'status_juridico'],
-                    ['NM_MUNICIPIO_ENTIDADE_ENSINO', 'nm_municipio_entidade_ensino', 'municipio'],
-                    ['SG_UF_ENTIDADE_ENSINO', 'sg_uf_entidade_ensino', 'uf'],
-                    ['NM_REGIAO_ENTIDADE_ENSINO', 'nm_regiao_entidade_ensino', 'regiao'],
-                    ['AN_BASE', 'an_base', 'ano_base']
-                ]
+            if column_mapping:
+                # Selecionar apenas colunas de IES encontradas
+                existing_columns = list(column_mapping.keys())
                 
-                # Encontrar colunas existentes
-                column_mapping = {}
-                for variants in ies_columns_variants:
-                    for variant in variants:
-                        if variant in df.columns:
-                            # Usar o primeiro nome da lista como padrão
-                            standard_name = variants[0]
-                            column_mapping[variant] = standard_name
-                            break
+                # Renomear para nomes padronizados (sem cópia profunda sob CoW)
+                df_ies = df[existing_columns].rename(columns=column_mapping)
                 
-                if column_mapping:
-                    # Selecionar apenas colunas de IES encontradas
-                    existing_columns = list(column_mapping.keys())
-                    df_ies = df[existing_columns].copy()
-                    
-                    # Renomear para nomes padronizados
-                    df_ies.rename(columns=column_mapping, inplace=True)
-                    
-                    # Remover duplicatas
-                    df_ies = df_ies.drop_duplicates()
-                    
-                    # Extrair ano do nome do resource
-                    year = None
-                    for y in years:
-                        if str(y) in resource_name:
-                            year = y
-                            break
-                    
-                    if year:
-                        df_ies['ANO_REFERENCIA'] = year
-                    
-                    all_ies_data.append(df_ies)
-                    logger.info(f"✅ {len(df_ies)} IES extraídas via API de {resource_name}")
-                else:
-                    logger.warning(f"⚠️ Nenhuma coluna de IES encontrada em {resource_name}")
-                    # Mostrar colunas disponíveis para debug
-                    logger.info(f"   Colunas disponíveis: {list(df.columns)[:10]}...")
-            
-            # Pausa entre requests
-            time.sleep(1)
+                if year:
+                    df_ies['ANO_REFERENCIA'] = year
+                
+                results[index] = df_ies
+                logger.info(f"✅ {len(df_ies)} IES extraídas via API de {resource_name}")
+            else:
+                logger.warning(f"⚠️ Nenhuma coluna de IES encontrada em {resource_name}")
+                # Mostrar colunas disponíveis para debug
+                logger.info(f"   Colunas disponíveis: {list(df.columns)[:10]}...")
+    
+    # Manter a ordem original dos resources (determina qual registro sobrevive à deduplicação)
+    all_ies_data = [results[index] for index in sorted(results)]
     
     if all_ies_data:
         # Consolidar todos os dados
@@ -285,10 +367,17 @@ def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2
         key_columns = ['CD_ENTIDADE_ENSINO', 'CD_ENTIDADE_CAPES', 'NM_ENTIDADE_ENSINO']
         existing_key_columns = [col for col in key_columns if col in df_consolidated.columns]
         
-        if existing_key_columns:
-            df_final = df_consolidated.drop_duplicates(subset=existing_key_columns)
-        else:
-            df_final = df_consolidated.drop_duplicates()
+        # Hash por linha (uint64) das colunas-chave; a deduplicação é feita sobre
+        # uma única coluna de hashes em vez de comparar todas as colunas
+        key_frame = df_consolidated[existing_key_columns] if existing_key_columns else df_consolidated
+        row_hashes = pd.util.hash_pandas_object(key_frame, index=False).to_numpy()
+        _, first_idx = np.unique(row_hashes, return_index=True)
+        df_final = df_consolidated.iloc[np.sort(first_idx)]
+        
+        # Converter após o concat (categorias diferentes por resource virariam object)
+        df_final = df_final.astype(
+            {col: 'category' for col in IES_CATEGORY_COLUMNS if col in df_final.columns}
+        )
         
         logger.info(f"🎯 DADOS CONSOLIDADOS VIA API: {len(df_final)} IES únicas")
         return df_final
@@ -297,7 +386,7 @@ def extract_ies_from_programas_api(client: CAPESAPIClient, years: List[int] = [2
         logger.error("❌ Nenhum dado de IES foi extraído via API")
         return pd.DataFrame()
 
-def save_to_postgresql(df: pd.DataFrame, db_config: Dict) -> bool:
+def save_to_postgresql(df: pd.DataFrame, db_config: DatabaseConfig) -> bool:
     """Salva dados de IES no PostgreSQL"""
     try:
         logger.info("💾 Salvando dados de IES no PostgreSQL...")
@@ -307,59 +396,48 @@ def save_to_postgresql(df: pd.DataFrame, db_config: Dict) -> bool:
             return False
         
         # Conectar ao banco
-        conn_string = f"postgresql://{db_config['username']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
-        engine = create_engine(conn_string)
+        engine = create_engine(db_config.dsn)
         
-        # Padronizar nomes das colunas
-        df_clean = df.copy()
-        df_clean.columns = [col.lower() for col in df_clean.columns]
+        # Padronizar nomes das colunas (novo frame sem cópia profunda sob CoW)
+        df_clean = df.set_axis(df.columns.str.lower(), axis=1)
         
         # Adicionar timestamp de criação
         df_clean['created_at'] = pd.Timestamp.now()
         
-        # Verificar se tabela existe e remover
-        with engine.connect() as conn:
+        # DROP, carga, chave primária e estatísticas em uma única transação
+        with engine.begin() as conn:
             conn.execute(text("DROP TABLE IF EXISTS raw_ies_api"))
-            conn.commit()
-        
-        # Salvar dados
-        df_clean.to_sql(
-            'raw_ies_api',
-            engine,
-            if_exists='replace',
-            index=False,
-            dtype={
-                'cd_entidade_ensino': 'BIGINT',
-                'cd_entidade_capes': 'BIGINT', 
-                'cd_entidade_emec': 'BIGINT',
-                'nm_entidade_ensino': 'TEXT',
-                'sg_entidade_ensino': 'VARCHAR(20)',
-                'ds_dependencia_administrativa': 'VARCHAR(100)',
-                'cs_status_juridico': 'VARCHAR(100)',
-                'nm_municipio_entidade_ensino': 'VARCHAR(200)',
-                'sg_uf_entidade_ensino': 'VARCHAR(2)',
-                'nm_regiao_entidade_ensino': 'VARCHAR(50)',
-                'ano_referencia': 'INTEGER',
-                'an_base': 'INTEGER',
-                'created_at': 'TIMESTAMP'
-            }
-        )
-        
-        # Adicionar chave primária
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE raw_ies_api ADD COLUMN id SERIAL PRIMARY KEY"))
-            conn.commit()
+            
+            # Tabela criada explicitamente (com a chave primária) antes da carga,
+            # evitando o ALTER TABLE posterior que reescrevia a tabela inteira
+            columns_ddl = ",\n                ".join(
+                f'"{col}" {RAW_IES_API_COLUMN_TYPES.get(col, "TEXT")}' for col in df_clean.columns
+            )
+            conn.execute(text(f"""
+            CREATE {'UNLOGGED ' if UNLOGGED_STAGING else ''}TABLE raw_ies_api (
+                id SERIAL PRIMARY KEY,
+                {columns_ddl}
+            )
+            """))
+            
+            # Salvar dados ('append' após o DROP evita a reflexão extra do 'replace')
+            df_clean.to_sql(
+                'raw_ies_api',
+                conn,
+                if_exists='append',
+                index=False
+            )
+            
+            # Estatísticas do planner atualizadas após a carga
+            conn.execute(text("ANALYZE raw_ies_api"))
+            
+            # Estatísticas finais (uma única consulta)
+            total_records, unique_ies = conn.execute(
+                text("SELECT COUNT(*), COUNT(DISTINCT nm_entidade_ensino) FROM raw_ies_api")
+            ).one()
         
         logger.info("✅ Dados salvos com sucesso no PostgreSQL!")
         
-        # Estatísticas finais
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM raw_ies_api")).fetchone()
-            total_records = result[0] if result else 0
-            
-            result = conn.execute(text("SELECT COUNT(DISTINCT nm_entidade_ensino) FROM raw_ies_api")).fetchone()
-            unique_ies = result[0] if result else 0
-        
         logger.info(f"📊 ESTATÍSTICAS FINAIS:")
         logger.info(f"   • Total de registros: {total_records}")
         logger.info(f"   • IES únicas: {unique_ies}")
@@ -13,11 +13,24 @@ import numpy as np
 import os
 import sys
 import argparse
+import csv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import logging
 
+from pandas._libs.parsers import STR_NA_VALUES
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:  # pyarrow é opcional; sem ele usa-se o leitor do pandas
+    pa = None
+    pacsv = None
+
 def get_project_root() -> Path:
     """Encontra o diretório raiz do projeto de forma robusta."""
     current_path = Path(__file__).resolve()
@@ -32,8 +45,11 @@ sys.path.insert(0, str(project_root))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+from src.utils.pg_staging import UNLOGGED_STAGING, pg_copy
+
+@lru_cache(maxsize=1)
 def get_db_engine():
-    """Cria engine de conexão com PostgreSQL."""
+    """Cria (uma única vez por processo) a engine de conexão com PostgreSQL."""
     load_dotenv(dotenv_path=project_root / '.env')
     
     db_user = os.getenv("DB_USER")
@@ -46,10 +62,73 @@ def get_db_engine():
         raise ValueError("Variáveis de ambiente do banco não configuradas")
 
     db_uri = f'postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}'
-    return create_engine(db_uri)
+    return create_engine(
+        db_uri,
+        pool_pre_ping=True,
+        # Carga sequencial (COPY, índices, validação): poucas conexões bastam
+        pool_size=4,
+        max_overflow=0,
+    )
+
+# Dtype das colunas de texto (buffers UTF-8 contíguos quando há pyarrow)
+TEXT_DTYPE = 'string[pyarrow]' if pa is not None else 'string'
+
+# Colunas de texto de baixa cardinalidade (já com os nomes padronizados)
+CATEGORY_COLUMNS = (
+    'uf_da_ies', 'sigla_da_regiao_da_ies', 'nome_da_regiao_da_ies',
+    'status_juridico_da_ies', 'modalidade_do_ppg', 'situacao_do_ppg',
+    'programa_em_rede', 'grande_area_do_ppg', 'area_de_avaliacao_do_ppg'
+)
+
+# Linhas lidas do CSV por bloco (limita o pico de memória da carga)
+CSV_CHUNKSIZE = 100_000
+
+# Colunas INTEGER de raw_ppg: chegam ao COPY como Int64 (um float64 seria
+# escrito como '1.0', que o PostgreSQL rejeita em colunas inteiras)
+INTEGER_COLUMNS = (
+    'ano_base', 'codigo_capes_da_ies', 'cd_regiao_ibge',
+    'codigo_grande_area_do_ppg', 'codigo_area_de_conhecimento_do_ppg',
+    'id_area_de_avaliacao_do_ppg', 'total_de_cursos_do_ppg',
+    'quantidade_de_docentes_no_ppg', 'quantidade_de_discentes_matriculados_no_ppg'
+)
+
+def _iter_arrow_batches(reader, chunksize):
+    """
+    Agrupa os RecordBatch do leitor em streaming em DataFrames de cerca de
+    ``chunksize`` linhas; só um bloco fica em memória por vez.
+    """
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(batches).to_pandas()
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches).to_pandas()
+
+def _read_csv_header(csv_path):
+    """Nomes das colunas do CSV (primeira linha)."""
+    with open(csv_path, encoding='latin1', newline='') as f:
+        return next(csv.reader(f, delimiter=';'))
+
+def load_ppg_csv(chunksize=CSV_CHUNKSIZE):
+    """
+    Abre o arquivo ppg_2024.csv para leitura em blocos.
 
-def load_ppg_csv():
-    """Carrega e processa o arquivo ppg_2024.csv."""
+    Com pyarrow disponível o arquivo é lido pelo leitor CSV em streaming do
+    Arrow (open_csv), com todas as colunas como texto: a inferência de tipos
+    do Arrow usa só o primeiro bloco e falharia no meio da carga ao achar,
+    adiante, um valor como 'N/D' em coluna numérica (a conversão fica com
+    clean_and_transform_data). Os mesmos marcadores de nulo do read_csv
+    ('', 'NA', 'N/A', 'nan'...) viram nulos nos dois leitores.
+
+    Sem pyarrow, ou se o Arrow rejeitar o primeiro bloco (o único lido na
+    abertura), usa o leitor em blocos do pandas. Um erro do Arrow em bloco
+    posterior só aparece durante a carga e interrompe a execução (a tabela
+    raw_ppg já terá sido recriada). Em ambos os casos retorna um iterador de
+    DataFrames com cerca de ``chunksize`` linhas cada.
+    """
     logger.info("📂 Carregando arquivo ppg_2024.csv...")
     
     csv_path = project_root / "staging" / "data" / "ppg_2024.csv"
@@ -57,22 +136,41 @@ def load_ppg_csv():
     if not csv_path.exists():
         raise FileNotFoundError(f"Arquivo não encontrado: {csv_path}")
     
+    if pacsv is not None:
+        try:
+            reader = pacsv.open_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(encoding='latin1'),
+                parse_options=pacsv.ParseOptions(delimiter=';'),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={col: pa.string() for col in _read_csv_header(csv_path)},
+                    strings_can_be_null=True,
+                    null_values=sorted(STR_NA_VALUES),
+                ),
+            )
+            logger.info("⚡ CSV aberto com o leitor em streaming do pyarrow")
+            return _iter_arrow_batches(reader, chunksize)
+        except pa.ArrowInvalid as e:
+            logger.warning(f"⚠️ pyarrow não conseguiu ler o CSV ({e}); usando pandas")
+    
     try:
         # Carregar CSV com encoding correto
-        df = pd.read_csv(csv_path, sep=';', encoding='latin1')
-        logger.info(f"✅ Carregados {len(df):,} registros de PPG")
-        
-        return df
+        return pd.read_csv(csv_path, sep=';', encoding='latin1', chunksize=chunksize)
         
     except Exception as e:
         logger.error(f"❌ Erro ao carregar CSV: {e}")
         raise
 
 def clean_and_transform_data(df):
-    """Limpa e transforma os dados para inserção no banco."""
+    """
+    Limpa e transforma os dados para inserção no banco.
+
+    O bloco recebido é modificado no próprio objeto (sem cópia): cada bloco
+    lido do CSV só é usado aqui.
+    """
     logger.info("🧹 Limpando e transformando dados...")
     
-    df_clean = df.copy()
+    df_clean = df
     
     # Mapear nomes de colunas para padrão snake_case
     column_mapping = {
@@ -102,7 +200,7 @@ def clean_and_transform_data(df):
     }
     
     # Renomear colunas
-    df_clean = df_clean.rename(columns=column_mapping)
+    df_clean.rename(columns=column_mapping, inplace=True)
     
     # Limpar campos de texto
     text_columns = [
@@ -112,11 +210,20 @@ def clean_and_transform_data(df):
         'area_de_conhecimento_do_ppg', 'area_de_avaliacao_do_ppg'
     ]
     
-    for col in text_columns:
-        if col in df_clean.columns:
-            # Remover espaços extras e padronizar
-            df_clean[col] = df_clean[col].astype(str).str.strip()
-            df_clean[col] = df_clean[col].replace(['nan', 'None', ''], None)
+    # Remover espaços extras em uma única passada; sem astype(str) os nulos
+    # continuam nulos em vez de virarem o texto 'nan'. Com pyarrow as colunas
+    # viram string[pyarrow] e strip/isin rodam nos kernels do Arrow
+    text_cols = df_clean[[c for c in text_columns if c in df_clean.columns]] \
+        .select_dtypes(include=['object', 'string']).columns
+    if len(text_cols):
+        stripped = df_clean[text_cols].astype(TEXT_DTYPE).apply(lambda s: s.str.strip())
+        df_clean[text_cols] = stripped.mask(stripped.isin(['nan', 'None', '']))
+    
+    # Colunas de poucos valores distintos (UF, região, modalidade...) como
+    # category: códigos inteiros + dicionário pequeno em vez de N strings
+    category_cols = [c for c in CATEGORY_COLUMNS if c in df_clean.columns]
+    if category_cols:
+        df_clean[category_cols] = df_clean[category_cols].astype('category')
     
     # Tratar campos numéricos
     numeric_columns = [
@@ -126,17 +233,27 @@ def clean_and_transform_data(df):
         'quantidade_de_docentes_no_ppg', 'quantidade_de_discentes_matriculados_no_ppg'
     ]
     
+    # Colunas já numéricas na leitura dispensam o to_numeric; as que vierem
+    # como texto (ex.: 'N/D' em uma célula) têm os valores inválidos anulados
     for col in numeric_columns:
-        if col in df_clean.columns:
+        if col not in df_clean.columns:
+            continue
+        if not pd.api.types.is_numeric_dtype(df_clean[col]):
             df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+        if col in INTEGER_COLUMNS and pd.api.types.is_float_dtype(df_clean[col]):
+            df_clean[col] = df_clean[col].round().astype('Int64')
     
     # Tratar campo código do PPG (texto)
+    # (nulos como NaN antes do astype: o leitor do Arrow entrega None e o
+    # texto resultante tem de ser o mesmo do read_csv)
     if 'codigo_do_ppg' in df_clean.columns:
-        df_clean['codigo_do_ppg'] = df_clean['codigo_do_ppg'].astype(str).str.strip()
+        codigo = df_clean['codigo_do_ppg']
+        df_clean['codigo_do_ppg'] = codigo.where(codigo.notna(), np.nan).astype(str).str.strip()
     
-    # Adicionar metadados
-    df_clean['fonte_arquivo'] = 'ppg_2024.csv'
-    df_clean['created_at'] = pd.Timestamp.now()
+    # Adicionar metadados (created_at fica a cargo do DEFAULT CURRENT_TIMESTAMP da tabela)
+    df_clean['fonte_arquivo'] = pd.Categorical.from_codes(
+        np.zeros(len(df_clean), dtype=np.int8), categories=['ppg_2024.csv']
+    )
     
     logger.info(f"✅ Dados transformados: {len(df_clean):,} registros, {len(df_clean.columns)} colunas")
     
@@ -148,8 +265,8 @@ def create_raw_ppg_table(engine):
     
     statements = [
         "DROP TABLE IF EXISTS raw_ppg CASCADE",
-        """
-        CREATE TABLE raw_ppg (
+        f"""
+        CREATE {'UNLOGGED ' if UNLOGGED_STAGING else ''}TABLE raw_ppg (
             id SERIAL PRIMARY KEY,
             ano_base INTEGER,
             codigo_capes_da_ies INTEGER,
@@ -177,76 +294,140 @@ def create_raw_ppg_table(engine):
             fonte_arquivo VARCHAR(100),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        """,
-        "CREATE INDEX idx_raw_ppg_codigo_ppg ON raw_ppg(codigo_do_ppg)",
-        "CREATE INDEX idx_raw_ppg_codigo_ies ON raw_ppg(codigo_capes_da_ies)",
-        "CREATE INDEX idx_raw_ppg_uf ON raw_ppg(uf_da_ies)",
-        "CREATE INDEX idx_raw_ppg_modalidade ON raw_ppg(modalidade_do_ppg)",
-        "CREATE INDEX idx_raw_ppg_grande_area ON raw_ppg(codigo_grande_area_do_ppg)",
-        "CREATE INDEX idx_raw_ppg_area_conhecimento ON raw_ppg(codigo_area_de_conhecimento_do_ppg)"
+        """
     ]
     
     try:
+        # DDL enviada em um único round-trip, direto ao driver
         with engine.begin() as conn:
-            for stmt in statements:
-                conn.execute(text(stmt))
+            conn.exec_driver_sql(";\n".join(statements))
         logger.info("✅ Tabela raw_ppg criada com sucesso")
         
     except Exception as e:
         logger.error(f"❌ Erro ao criar tabela: {e}")
         raise
 
-def save_to_postgres(df, engine, table_name='raw_ppg'):
-    """Salva DataFrame no PostgreSQL."""
-    logger.info(f"💾 Salvando dados na tabela {table_name}...")
+# Índices secundários de raw_ppg: criados só depois da carga, em um único build
+# ordenado por índice, em vez de mantidos linha a linha durante o COPY
+RAW_PPG_INDEXES = (
+    "CREATE INDEX idx_raw_ppg_codigo_ppg ON raw_ppg(codigo_do_ppg)",
+    "CREATE INDEX idx_raw_ppg_codigo_ies ON raw_ppg(codigo_capes_da_ies)",
+    "CREATE INDEX idx_raw_ppg_uf ON raw_ppg(uf_da_ies)",
+    "CREATE INDEX idx_raw_ppg_modalidade ON raw_ppg(modalidade_do_ppg)",
+    "CREATE INDEX idx_raw_ppg_grande_area ON raw_ppg(codigo_grande_area_do_ppg)",
+    "CREATE INDEX idx_raw_ppg_area_conhecimento ON raw_ppg(codigo_area_de_conhecimento_do_ppg)"
+)
+
+def create_raw_ppg_indexes(engine):
+    """Cria os índices de raw_ppg (chamar após a carga dos dados)."""
+    logger.info("🗂️ Criando índices da tabela raw_ppg...")
     
     try:
-        # Salvar dados
-        df.to_sql(
-            table_name,
-            engine,
-            if_exists='append',
-            index=False,
-            method='multi',
-            chunksize=1000
-        )
+        with engine.begin() as conn:
+            conn.exec_driver_sql(";\n".join(RAW_PPG_INDEXES))
+        logger.info(f"✅ {len(RAW_PPG_INDEXES)} índices criados")
         
-        # Verificar inserção
-        with engine.connect() as conn:
-            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-            count = result.scalar()
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar índices: {e}")
+        raise
+
+def transform_chunks(reader, max_workers=None, max_pending=4):
+    """
+    Aplica clean_and_transform_data aos blocos em um pool de threads.
+
+    No máximo ``max_pending`` blocos ficam em processamento ao mesmo tempo
+    (limita a memória), e os blocos limpos são devolvidos na ordem de
+    leitura, para que o consumidor (o COPY) trabalhe em paralelo à limpeza.
+    """
+    max_workers = max_workers or min(max_pending, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in reader:
+            pending.append(executor.submit(clean_and_transform_data, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def save_to_postgres(chunks, engine, table_name='raw_ppg'):
+    """
+    Salva no PostgreSQL um DataFrame ou um iterável de blocos de DataFrame.
+
+    Os blocos são gravados via COPY em uma única transação, à medida que são
+    produzidos. Retorna o total de registros gravados (a tabela é recriada
+    antes da carga, então coincide com o total da tabela).
+    """
+    logger.info(f"💾 Salvando dados na tabela {table_name}...")
+    
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    
+    count = 0
+    try:
+        with engine.begin() as conn:
+            for chunk in chunks:
+                chunk.to_sql(
+                    table_name,
+                    conn,
+                    if_exists='append',
+                    index=False,
+                    method=pg_copy,
+                    chunksize=50000
+                )
+                count += len(chunk)
         
         logger.info(f"✅ {count:,} registros inseridos na tabela {table_name}")
+        return count
         
     except Exception as e:
         logger.error(f"❌ Erro ao salvar no PostgreSQL: {e}")
         raise
 
-def validate_data(engine):
-    """Valida os dados inseridos."""
+def validate_data(engine, expected_count=None):
+    """
+    Valida os dados inseridos.
+
+    ``expected_count`` é o total gravado pela carga; quando informado, é
+    conferido com o COUNT(*) (calculado na mesma varredura dos distintos).
+    """
     logger.info("🔍 Validando dados inseridos...")
     
-    validation_queries = [
-        ("Total de registros", "SELECT COUNT(*) FROM raw_ppg"),
-        ("PPGs únicos", "SELECT COUNT(DISTINCT codigo_do_ppg) FROM raw_ppg"),
-        ("IES únicas", "SELECT COUNT(DISTINCT codigo_capes_da_ies) FROM raw_ppg"),
-        ("UFs únicas", "SELECT COUNT(DISTINCT uf_da_ies) FROM raw_ppg"),
-        ("Modalidades", "SELECT modalidade_do_ppg, COUNT(*) FROM raw_ppg GROUP BY modalidade_do_ppg ORDER BY COUNT(*) DESC"),
-        ("Regiões", "SELECT nome_da_regiao_da_ies, COUNT(*) FROM raw_ppg GROUP BY nome_da_regiao_da_ies ORDER BY COUNT(*) DESC")
-    ]
+    # Contagens gerais: uma única varredura da tabela
+    totals_query = """
+        SELECT COUNT(*),
+               COUNT(DISTINCT codigo_do_ppg),
+               COUNT(DISTINCT codigo_capes_da_ies),
+               COUNT(DISTINCT uf_da_ies)
+        FROM raw_ppg
+    """
+    totals_labels = ("Total de registros", "PPGs únicos", "IES únicas", "UFs únicas")
+    
+    # Distribuições por modalidade e por região na mesma varredura (GROUPING SETS);
+    # grupo 0 = modalidade, grupo 1 = região
+    groups_query = """
+        SELECT GROUPING(modalidade_do_ppg) AS grupo,
+               CASE WHEN GROUPING(modalidade_do_ppg) = 0
+                    THEN modalidade_do_ppg ELSE nome_da_regiao_da_ies END AS valor,
+               COUNT(*) AS total
+        FROM raw_ppg
+        GROUP BY GROUPING SETS ((modalidade_do_ppg), (nome_da_regiao_da_ies))
+        ORDER BY grupo, total DESC
+    """
+    groups_labels = ("Modalidades", "Regiões")
     
     try:
         with engine.connect() as conn:
-            for description, query in validation_queries:
-                result = conn.execute(text(query))
-                
-                if "GROUP BY" in query:
-                    logger.info(f"📊 {description}:")
-                    for row in result:
-                        logger.info(f"   {row[0]}: {row[1]:,}")
-                else:
-                    count = result.scalar()
-                    logger.info(f"📊 {description}: {count:,}")
+            totals = conn.execute(text(totals_query)).one()
+            for description, count in zip(totals_labels, totals):
+                logger.info(f"📊 {description}: {count:,}")
+            if expected_count is not None and totals[0] != expected_count:
+                logger.warning(f"⚠️ Carga gravou {expected_count:,} registros, tabela tem {totals[0]:,}")
+            
+            rows = conn.execute(text(groups_query)).all()
+            for grupo, description in enumerate(groups_labels):
+                logger.info(f"📊 {description}:")
+                for _, valor, total in (row for row in rows if row[0] == grupo):
+                    logger.info(f"   {valor}: {total:,}")
         
         logger.info("✅ Validação concluída")
         
@@ -270,27 +451,27 @@ def main():
             validate_data(engine)
             return
         
-        # Carregar dados do CSV
-        df_raw = load_ppg_csv()
-        
-        # Transformar dados
-        df_clean = clean_and_transform_data(df_raw)
+        # Abrir o CSV em blocos (falha cedo se o arquivo não existir)
+        reader = load_ppg_csv()
         
         # Criar tabela
         create_raw_ppg_table(engine)
         
-        # Salvar no PostgreSQL
-        save_to_postgres(df_clean, engine)
+        # Transformar (em paralelo) e salvar no PostgreSQL bloco a bloco
+        total = save_to_postgres(transform_chunks(reader), engine)
+        
+        # Índices só depois da carga
+        create_raw_ppg_indexes(engine)
         
         # Validar dados
-        validate_data(engine)
+        validate_data(engine, expected_count=total)
         
         print("\n" + "="*60)
         print("🎉 CARREGAMENTO DE PPG CONCLUÍDO COM SUCESSO!")
         print("="*60)
         print("✅ Tabela: raw_ppg")
         print("✅ Fonte: ppg_2024.csv")
-        print(f"✅ Registros: {len(df_clean):,}")
+        print(f"✅ Registros: {total:,}")
         print("✅ Índices: Criados para performance")
         print("✅ Validação: Dados verificados")
         print("="*60)
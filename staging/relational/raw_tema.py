@@ -4,11 +4,84 @@ Script para gerar raw_tema e salvar no PostgreSQL
 Uma única tabela com: macrotema_id, macrotema_nome, tema_id, tema_nome, palavrachave_id, palavrachave_nome
 """
 
+import hashlib
+import re
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import argparse
 from sqlalchemy import create_engine, text
 import os
+import sys
+
+# Garantir que o diretório raiz esteja no PYTHONPATH (execução via CLI)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.pg_staging import pg_copy, staging_table_ddl
+
+# Leitor XLSX: python-calamine (parser em Rust, pandas >= 2.2) quando instalado;
+# caso contrário, o openpyxl padrão do pandas
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# Leitura da planilha já convertida, em Parquet dentro do projeto (ao lado da
+# planilha): um /tmp compartilhado permitiria a outro usuário plantar o arquivo
+CACHE_DIR = PROJECT_ROOT / 'staging' / 'data' / 'cache'
+
+# Separadores aceitos entre palavras-chave na planilha (compilado uma vez)
+_RE_SEPARADOR_PALAVRAS = re.compile(r'[\n\r|/;,]')
+
+def _ler_planilha(excel_path, sheet_name, usar_cache=True):
+    """Lê a aba da planilha, reaproveitando um Parquet em cache quando o
+    arquivo não mudou (chave: caminho, mtime e tamanho)."""
+    stat = excel_path.stat()
+    chave = hashlib.blake2b(
+        f'{excel_path}|{sheet_name}|{stat.st_mtime_ns}|{stat.st_size}'.encode(),
+        digest_size=8
+    ).hexdigest()
+    cache_path = CACHE_DIR / f'raw_tema_{chave}.parquet'
+
+    if usar_cache and cache_path.exists():
+        try:
+            df = pd.read_parquet(cache_path)
+            print(f"⚡ Planilha lida do cache: {cache_path}")
+            return df
+        except Exception as e:
+            print(f"⚠️ Cache inválido ({e}); relendo a planilha")
+
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, engine=EXCEL_ENGINE)
+
+    if usar_cache:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cache_path, index=False, compression='zstd')
+        except Exception as e:
+            # Cache é só atalho: sem pyarrow ou com colunas de tipos mistos, segue sem ele
+            cache_path.unlink(missing_ok=True)
+            print(f"⚠️ Não foi possível gravar o cache da planilha: {e}")
+        else:
+            # Só a versão atual da planilha fica em cache
+            for antigo in CACHE_DIR.glob('raw_tema_*.parquet'):
+                if antigo != cache_path:
+                    antigo.unlink(missing_ok=True)
+    return df
+
+@lru_cache(maxsize=1)
+def get_db_engine(connection_string):
+    """Cria (uma única vez por processo) a engine de conexão com PostgreSQL."""
+    # Carga única e sequencial: uma conexão basta e dispensa o ping a cada checkout
+    return create_engine(
+        connection_string,
+        pool_pre_ping=False,
+        pool_size=1,
+        max_overflow=0
+    )
 
 def save_to_postgres(df, table_name='raw_tema'):
     """Salva DataFrame no PostgreSQL"""
@@ -24,28 +97,32 @@ def save_to_postgres(df, table_name='raw_tema'):
     
     try:
         print(f"🔗 Conectando ao PostgreSQL: {host}:{port}/{database}")
-        engine = create_engine(connection_string)
+        engine = get_db_engine(connection_string)
         
-        # Testar conexão
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT version()"))
-            row = result.fetchone()
+        # Teste de conexão, DDL e COPY na mesma conexão e em uma única
+        # transação (um só commit)
+        print(f"💾 Salvando tabela: {table_name}")
+        with engine.begin() as conn:
+            row = conn.execute(text("SELECT version()")).fetchone()
             if row:
                 version = row[0]
                 print(f"✅ Conectado! Versão: {version[:50]}...")
             else:
                 print(f"✅ Conectado ao PostgreSQL!")
-        
-        # Salvar dados
-        print(f"💾 Salvando tabela: {table_name}")
-        df.to_sql(
-            table_name, 
-            engine, 
-            if_exists='replace',  # Substitui a tabela se existir
-            index=False,
-            method='multi',  # Mais rápido para grandes volumes
-            chunksize=1000
-        )
+            
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+            
+            # DDL gerado pelo próprio pandas, criado antes da carga para permitir UNLOGGED
+            conn.execute(text(staging_table_ddl(df, table_name, conn)))
+            
+            df.to_sql(
+                table_name, 
+                conn, 
+                if_exists='append',  # Tabela recém-criada acima
+                index=False,
+                method=pg_copy,  # COPY: sem INSERTs multi-VALUES para o servidor interpretar
+                chunksize=50000
+            )
         
         print(f"✅ Dados salvos no PostgreSQL!")
         return True
@@ -65,6 +142,7 @@ def main():
     parser = argparse.ArgumentParser(description='Processar macro temas e salvar no PostgreSQL')
     parser.add_argument('--postgres', action='store_true', help='Salvar no PostgreSQL')
     parser.add_argument('--table', default='raw_tema', help='Nome da tabela no PostgreSQL')
+    parser.add_argument('--no-cache', action='store_true', help='Ignorar o cache Parquet da planilha')
     args = parser.parse_args()
     
     # Caminhos
@@ -75,7 +153,7 @@ def main():
     
     # Ler planilha
     try:
-        df = pd.read_excel(excel_path, sheet_name='macro-temas-v2')
+        df = _ler_planilha(excel_path, 'macro-temas-v2', usar_cache=not args.no_cache)
     except FileNotFoundError:
         print(f"❌ Arquivo não encontrado: {excel_path}")
         return
@@ -112,14 +190,20 @@ def main():
     print(f"   Palavras-chave: {palavras_col}")
     print(f"   UF: {uf_col}")
     
-    # Preparar DataFrame
-    df_work = df.copy()
-    df_work['macrotema_nome'] = df_work[macro_col].fillna('').astype(str).str.strip()
-    df_work['tema_nome'] = df_work[tema_col].fillna('').astype(str).str.strip()
+    # Preparar DataFrame (read_excel já devolve um frame novo; sem cópia)
+    df_work = df
+    # Textos como string[pyarrow]: buffers contíguos em vez de objetos Python
+    df_work['macrotema_nome'] = df_work[macro_col].astype('string[pyarrow]').str.strip().fillna('')
+    df_work['tema_nome'] = df_work[tema_col].astype('string[pyarrow]').str.strip().fillna('')
     
     # Adicionar UF
     if uf_col and uf_col in df_work.columns:
-        df_work['uf'] = df_work[uf_col].fillna('').astype(str).str.strip().str.upper()
+        # Normaliza apenas os valores distintos (poucas UFs) e expande pelos
+        # códigos; nulos (código -1) caem na última posição, ''
+        codes, ufs = pd.factorize(df_work[uf_col].astype('string[pyarrow]'))
+        ufs_norm = pd.Index(ufs).str.strip().str.upper()
+        lookup = np.append(ufs_norm.to_numpy(dtype=object), '')
+        df_work['uf'] = pd.Categorical(lookup[codes])
     else:
         df_work['uf'] = ''
     
@@ -129,22 +213,32 @@ def main():
     else:
         df_work['palavras_chave'] = ''
     
-    # Desnormalizar palavras-chave (explode)
-    df_work['palavrachave_nome'] = (
-        df_work['palavras_chave']
-        .str.replace(r'[\n\r|/;,]', ';', regex=True)
-        .str.split(';')
+    # Desnormalizar palavras-chave (explode) levando só as colunas usadas daqui
+    # em diante: as demais colunas da planilha não são replicadas por palavra-chave
+    df_work = df_work[['macrotema_nome', 'tema_nome', 'uf', 'palavras_chave']].assign(
+        palavrachave_nome=df_work['palavras_chave'].str.split(_RE_SEPARADOR_PALAVRAS)
     )
     df_work = df_work.explode('palavrachave_nome').reset_index(drop=True)
-    df_work['palavrachave_nome'] = df_work['palavrachave_nome'].fillna('').str.strip()
+    df_work['palavrachave_nome'] = (
+        df_work['palavrachave_nome'].astype('string[pyarrow]').str.strip().fillna('')
+    )
     
     # Gerar IDs
     df_work['macrotema_id'], _ = pd.factorize(df_work['macrotema_nome'], sort=True)
     df_work['macrotema_id'] += 1
     
-    tema_key = df_work['macrotema_nome'] + '||' + df_work['tema_nome']
-    df_work['tema_id'], _ = pd.factorize(tema_key, sort=True)
-    df_work['tema_id'] += 1
+    # tema_id segue a ordem da chave 'macrotema||tema' (fact_titulacao e
+    # dim_tema dependem dessa numeração); a chave é montada só para os pares
+    # distintos e o número volta às linhas pelos códigos do factorize
+    pares_codes, pares = pd.factorize(
+        pd.MultiIndex.from_arrays([df_work['macrotema_nome'], df_work['tema_nome']])
+    )
+    tema_key = (
+        pares.get_level_values(0).astype(str) + '||' + pares.get_level_values(1).astype(str)
+    ).to_numpy(dtype=object)
+    tema_rank = np.empty(len(tema_key), dtype=np.int64)
+    tema_rank[np.argsort(tema_key, kind='stable')] = np.arange(len(tema_key))
+    df_work['tema_id'] = tema_rank[pares_codes] + 1
     
     df_work['palavrachave_id'], _ = pd.factorize(df_work['palavrachave_nome'], sort=True)
     df_work['palavrachave_id'] += 1
@@ -162,8 +256,13 @@ def main():
     
     df_final = df_work[final_cols].copy()
     
+    # Poucos macrotemas distintos: category (feito após a geração dos IDs)
+    df_final['macrotema_nome'] = df_final['macrotema_nome'].astype('category')
+    
     # Adicionar metadados
-    df_final['fonte_arquivo'] = excel_path.name
+    df_final['fonte_arquivo'] = pd.Categorical.from_codes(
+        np.zeros(len(df_final), dtype=np.int8), categories=[excel_path.name]
+    )
     df_final['created_at'] = pd.Timestamp.now()
     
     # Salvar no PostgreSQL se solicitado
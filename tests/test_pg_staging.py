@@ -0,0 +1,148 @@
+"""
+Testes da carga via COPY (src/utils/pg_staging.py): '' precisa continuar ''
+e apenas valores ausentes viram NULL, como no to_sql com INSERTs.
+"""
+
+import csv
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils import pg_staging
+
+
+class _FakeCursor:
+    """Cursor que guarda o comando e o conteúdo enviado ao copy_expert."""
+
+    def __init__(self, sink):
+        self._sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, file):
+        self._sink['sql'] = sql
+        self._sink['data'] = file.read()
+
+
+class _FakeConn:
+    def __init__(self, sink):
+        self.connection = self
+        self._sink = sink
+
+    def cursor(self):
+        return _FakeCursor(self._sink)
+
+
+def _ler_copy_csv(data):
+    """Interpreta o CSV como o COPY ... CSV do PostgreSQL: vazio sem aspas é NULL."""
+    linhas = []
+    for linha in data.splitlines():
+        campos, atual, entre_aspas, com_aspas, i = [], '', False, False, 0
+        while i < len(linha):
+            c = linha[i]
+            if entre_aspas:
+                if c == '"' and linha[i + 1:i + 2] == '"':
+                    atual += '"'
+                    i += 1
+                elif c == '"':
+                    entre_aspas = False
+                else:
+                    atual += c
+            elif c == '"':
+                entre_aspas = com_aspas = True
+            elif c == ',':
+                campos.append(atual if atual or com_aspas else None)
+                atual, com_aspas = '', False
+            else:
+                atual += c
+            i += 1
+        campos.append(atual if atual or com_aspas else None)
+        linhas.append(campos)
+    return linhas
+
+
+def _copiar(df):
+    """Executa o to_sql com pg_copy e devolve o CSV entregue ao COPY."""
+    sink = {}
+    engine = sa.create_engine('sqlite://')
+
+    def metodo(table, conn, keys, data_iter):
+        pg_staging.pg_copy(table, _FakeConn(sink), keys, data_iter)
+
+    with engine.begin() as conn:
+        df.to_sql('raw_tema', conn, index=False, method=metodo)
+    return sink
+
+
+@pytest.fixture(params=['nativo', 'compatibilidade'])
+def modo_csv(request, monkeypatch):
+    """Exercita o QUOTE_NOTNULL (Python 3.12+) e o caminho anterior ao 3.12."""
+    if request.param == 'nativo':
+        if not hasattr(csv, 'QUOTE_NOTNULL'):
+            pytest.skip('csv.QUOTE_NOTNULL requer Python 3.12+')
+    else:
+        monkeypatch.delattr(csv, 'QUOTE_NOTNULL', raising=False)
+    return request.param
+
+
+def test_string_vazia_nao_vira_null(modo_csv):
+    df = pd.DataFrame({
+        'tema_id': [1, 2],
+        'tema_nome': ['Saúde', ''],
+        'palavrachave_nome': ['', 'água, "potável"'],
+        'uf': pd.Series(['', None], dtype='string[pyarrow]'),
+        'nota': [1.5, None],
+    })
+
+    sink = _copiar(df)
+
+    assert sink['sql'].startswith('COPY raw_tema ("tema_id", "tema_nome"')
+    assert _ler_copy_csv(sink['data']) == [
+        ['1', 'Saúde', '', '', '1.5'],
+        ['2', '', 'água, "potável"', None, None],
+    ]
+
+
+def test_stream_em_varios_blocos(modo_csv):
+    linhas = [(i, '' if i % 2 else f'x{i}', None) for i in range(2500)]
+    stream = pg_staging.CsvRowStream(iter(linhas), block_rows=1000)
+
+    partes = iter(lambda: stream.read(4096), '')
+    lidas = _ler_copy_csv(''.join(partes))
+
+    assert len(lidas) == 2500
+    assert lidas[1] == ['1', '', None]
+    assert lidas[2] == ['2', 'x2', None]
+
+
+@pytest.mark.skipif(
+    not os.getenv('TEST_DATABASE_URL'),
+    reason='defina TEST_DATABASE_URL (postgresql://...) para o teste com banco',
+)
+def test_copy_no_postgres_preserva_string_vazia():
+    engine = sa.create_engine(os.environ['TEST_DATABASE_URL'])
+    df = pd.DataFrame({'tema_nome': ['Saúde', 'Educação'], 'uf': ['', None]})
+
+    with engine.begin() as conn:
+        conn.execute(sa.text('DROP TABLE IF EXISTS test_raw_tema_copy'))
+        conn.execute(sa.text(pg_staging.staging_table_ddl(df, 'test_raw_tema_copy', conn)))
+        df.to_sql('test_raw_tema_copy', conn, if_exists='append', index=False,
+                  method=pg_staging.pg_copy)
+        lidos = conn.execute(
+            sa.text('SELECT tema_nome, uf FROM test_raw_tema_copy ORDER BY tema_nome')
+        ).fetchall()
+        conn.execute(sa.text('DROP TABLE test_raw_tema_copy'))
+
+    assert [tuple(r) for r in lidos] == [('Educação', None), ('Saúde', '')]